@@ -4,13 +4,23 @@ Tests for yaml-diff tool.
 Includes both unit tests and property-based tests using Hypothesis.
 """
 
+import io
+import os
+import sys
+import json
+import datetime
+import subprocess
+from collections import OrderedDict
+
 import pytest
-from hypothesis import given, strategies as st, settings
+from hypothesis import given, strategies as st, settings, Phase
 
+import yaml_diff
 from yaml_diff import (
     YamlDiffError,
     DiffOp,
     load_yaml,
+    _parse_yaml,
     check_unsupported_features,
     compute_diff,
     canonicalize,
@@ -19,42 +29,55 @@ from yaml_diff import (
     format_human,
     should_use_color,
     compute_exit_code,
+    main,
+)
+
+
+# =============================================================================
+# Hypothesis settings profiles
+# =============================================================================
+
+# dev: quick local runs, no shrinking; ci: full example count; nightly: soak run.
+# Select with HYP_PROFILE=<name> (defaults to dev).
+settings.register_profile(
+    "dev",
+    max_examples=20,
+    deadline=None,
+    phases=[Phase.explicit, Phase.reuse, Phase.generate],
 )
+settings.register_profile("ci", max_examples=100, deadline=None)
+settings.register_profile("nightly", max_examples=1000, deadline=None)
+settings.load_profile(os.environ.get("HYP_PROFILE", "dev"))
 
 
 # =============================================================================
 # Hypothesis Strategies for YAML values
 # =============================================================================
 
+# Character alphabets, built once at import and shared by every strategy below
+_TEXT_CHARS = st.characters(blacklist_categories=('Cs',), blacklist_characters='&*!')
+_KEY_CHARS = st.characters(blacklist_categories=('Cs',), blacklist_characters='&*!:')
+
+# Map keys (non-empty, no ':' so they stay valid YAML keys)
+_KEY_STRATEGY = st.text(alphabet=_KEY_CHARS, min_size=1, max_size=20)
+
 # Primitive values that are valid in YAML
 yaml_primitives = st.one_of(
     st.none(),
     st.booleans(),
-    st.integers(min_value=-1000000, max_value=1000000),
-    st.floats(allow_nan=False, allow_infinity=False, min_value=-1e10, max_value=1e10),
-    st.text(
-        alphabet=st.characters(blacklist_categories=('Cs',), blacklist_characters='&*!'),
-        min_size=0,
-        max_size=50
-    )
+    st.integers(min_value=-1000, max_value=1000),
+    st.floats(allow_nan=False, allow_infinity=False, allow_subnormal=False, width=32),
+    st.text(alphabet=_TEXT_CHARS, min_size=0, max_size=10)
 )
 
 # Recursive YAML structure (maps and lists containing primitives or nested structures)
 yaml_values = st.recursive(
     yaml_primitives,
     lambda children: st.one_of(
-        st.lists(children, max_size=5),
-        st.dictionaries(
-            st.text(
-                alphabet=st.characters(blacklist_categories=('Cs',), blacklist_characters='&*!:'),
-                min_size=1,
-                max_size=20
-            ),
-            children,
-            max_size=5
-        )
+        st.lists(children, max_size=3),
+        st.dictionaries(_KEY_STRATEGY, children, max_size=5)
     ),
-    max_leaves=20
+    max_leaves=8
 )
 
 
@@ -65,7 +88,6 @@ yaml_values = st.recursive(
 # **Feature: yaml-diff, Property 5: Identity Property**
 # **Validates: Requirements 2.4, 4.5, 6.2**
 @given(value=yaml_values)
-@settings(max_examples=100)
 def test_identity_property(value):
     """
     Property 5: Identity Property
@@ -79,11 +101,7 @@ def test_identity_property(value):
 
 # Maps with at least 2 keys for meaningful shuffle testing
 yaml_maps = st.dictionaries(
-    st.text(
-        alphabet=st.characters(blacklist_categories=('Cs',), blacklist_characters='&*!:'),
-        min_size=1,
-        max_size=20
-    ),
+    _KEY_STRATEGY,
     yaml_values,
     min_size=2,
     max_size=10
@@ -92,13 +110,12 @@ yaml_maps = st.dictionaries(
 
 def shuffle_keys(d: dict) -> dict:
     """Return a new dict with keys in reversed order."""
-    return dict(reversed(list(d.items())))
+    return {k: d[k] for k in reversed(d)}
 
 
 # **Feature: yaml-diff, Property 1: Key Ordering Invariance**
 # **Validates: Requirements 1.3**
 @given(original=yaml_maps)
-@settings(max_examples=100)
 def test_key_ordering_invariance(original):
     """
     Property 1: Key Ordering Invariance
@@ -134,7 +151,6 @@ def test_key_ordering_invariance(original):
     ),
     keys_to_remove=st.integers(min_value=0, max_value=2)
 )
-@settings(max_examples=100)
 def test_map_diff_correctness(base_map, keys_to_add, keys_to_remove):
     """
     Property 2: Map Diff Correctness
@@ -162,26 +178,33 @@ def test_map_diff_correctness(base_map, keys_to_add, keys_to_remove):
     
     diffs = compute_diff(old, new)
     
+    # Bucket diffs by (top-level key, op) in a single pass
+    buckets = {}
+    for d in diffs:
+        buckets.setdefault((d.path[0] if d.path else '', d.op), []).append(d)
+    top_level_keys = {key for key, _ in buckets}
+    
+    old_keys = old.keys()
+    new_keys = new.keys()
+    
     # Verify add operations
-    added_keys = set(new.keys()) - set(old.keys())
-    for key in added_keys:
-        add_ops = [d for d in diffs if d.op == 'add' and d.path == [str(key)]]
+    for key in new_keys - old_keys:
+        add_ops = buckets.get((str(key), 'add'), [])
         assert len(add_ops) == 1, f"Expected exactly one add op for key '{key}'"
+        assert add_ops[0].path == (str(key),)
         assert add_ops[0].new_value == new[key]
     
     # Verify remove operations
-    removed_keys = set(old.keys()) - set(new.keys())
-    for key in removed_keys:
-        remove_ops = [d for d in diffs if d.op == 'remove' and d.path == [str(key)]]
+    for key in old_keys - new_keys:
+        remove_ops = buckets.get((str(key), 'remove'), [])
         assert len(remove_ops) == 1, f"Expected exactly one remove op for key '{key}'"
+        assert remove_ops[0].path == (str(key),)
         assert remove_ops[0].old_value == old[key]
     
     # Verify unchanged keys have no operations
-    unchanged_keys = set(old.keys()) & set(new.keys())
-    for key in unchanged_keys:
+    for key in old_keys & new_keys:
         if old[key] == new[key]:
-            key_ops = [d for d in diffs if d.path and d.path[0] == str(key)]
-            assert len(key_ops) == 0, f"Expected no ops for unchanged key '{key}'"
+            assert str(key) not in top_level_keys, f"Expected no ops for unchanged key '{key}'"
 
 
 # **Feature: yaml-diff, Property 4: List Diff Correctness**
@@ -191,7 +214,6 @@ def test_map_diff_correctness(base_map, keys_to_add, keys_to_remove):
     items_to_add=st.lists(yaml_primitives, min_size=0, max_size=3),
     items_to_remove=st.integers(min_value=0, max_value=2)
 )
-@settings(max_examples=100)
 def test_list_diff_correctness(base_list, items_to_add, items_to_remove):
     """
     Property 4: List Diff Correctness
@@ -214,17 +236,21 @@ def test_list_diff_correctness(base_list, items_to_add, items_to_remove):
     
     diffs = compute_diff(old, new)
     
+    # Index diffs by (op, path); a collision means a duplicate operation
+    index = {(d.op, d.path): d for d in diffs}
+    assert len(index) == len(diffs), f"Duplicate operations in {diffs}"
+    
     # Verify additions (indices that exist in new but not old)
     for i in range(len(old), len(new)):
-        add_ops = [d for d in diffs if d.op == 'add' and d.path == [str(i)]]
-        assert len(add_ops) == 1, f"Expected add op at index {i}"
-        assert add_ops[0].new_value == new[i]
+        add_op = index.get(('add', (str(i),)))
+        assert add_op is not None, f"Expected add op at index {i}"
+        assert add_op.new_value == new[i]
     
     # Verify removals (indices that exist in old but not new)
     for i in range(len(new), len(old)):
-        remove_ops = [d for d in diffs if d.op == 'remove' and d.path == [str(i)]]
-        assert len(remove_ops) == 1, f"Expected remove op at index {i}"
-        assert remove_ops[0].old_value == old[i]
+        remove_op = index.get(('remove', (str(i),)))
+        assert remove_op is not None, f"Expected remove op at index {i}"
+        assert remove_op.old_value == old[i]
 
 
 # Nested structures for recursive diff testing
@@ -243,10 +269,32 @@ nested_yaml = st.recursive(
 )
 
 
+def set_at_path(data, path, value):
+    """
+    Set value at path, returning a modified copy.
+    
+    Only the containers along the path are copied; siblings are shared with
+    the original, which is safe because compute_diff never mutates its inputs.
+    """
+    if not path:
+        return value
+    head, *rest = path
+    if isinstance(data, dict):
+        result = dict(data)
+        result[head] = set_at_path(data[head], rest, value)
+    else:
+        result = list(data)
+        index = int(head)
+        result[index] = set_at_path(data[index], rest, value)
+    return result
+
+
 # **Feature: yaml-diff, Property 3: Recursive Diff Correctness**
 # **Validates: Requirements 2.5, 3.5**
-@given(structure=nested_yaml, new_value=yaml_primitives)
-@settings(max_examples=100)
+@given(
+    structure=nested_yaml.filter(lambda x: isinstance(x, (dict, list))),
+    new_value=yaml_primitives
+)
 def test_recursive_diff_correctness(structure, new_value):
     """
     Property 3: Recursive Diff Correctness
@@ -254,41 +302,21 @@ def test_recursive_diff_correctness(structure, new_value):
     For any nested YAML structure, changes at any nesting depth SHALL be
     detected and reported with the correct path.
     """
-    # Skip primitives - we need nested structures
-    if not isinstance(structure, (dict, list)):
-        return
-    
     # Find a path to a leaf value and modify it
-    def find_leaf_path(data, path=[]):
-        if isinstance(data, dict) and data:
-            key = list(data.keys())[0]
-            return find_leaf_path(data[key], path + [str(key)])
-        elif isinstance(data, list) and data:
-            return find_leaf_path(data[0], path + ['0'])
-        else:
-            return path
-    
-    def set_at_path(data, path, value):
-        """Set value at path, returning a modified copy."""
-        import copy
-        result = copy.deepcopy(data)
-        current = result
-        for key in path[:-1]:
-            if isinstance(current, dict):
-                current = current[key]
+    def find_leaf_path(data):
+        path = []
+        while True:
+            if isinstance(data, dict) and data:
+                key = next(iter(data))
+                path.append(str(key))
+                data = data[key]
+            elif isinstance(data, list) and data:
+                path.append('0')
+                data = data[0]
             else:
-                current = current[int(key)]
-        if path:
-            last_key = path[-1]
-            if isinstance(current, dict):
-                current[last_key] = value
-            else:
-                current[int(last_key)] = value
-        return result
+                return path
     
     path = find_leaf_path(structure)
-    if not path:
-        return
     
     modified = set_at_path(structure, path, new_value)
     
@@ -314,48 +342,51 @@ def test_recursive_diff_correctness(structure, new_value):
     
     # Should have exactly one diff at the correct path
     assert len(diffs) == 1, f"Expected 1 diff, got {len(diffs)}: {diffs}"
-    assert diffs[0].path == path, f"Expected path {path}, got {diffs[0].path}"
+    assert diffs[0].path == tuple(path), f"Expected path {path}, got {diffs[0].path}"
     assert diffs[0].op == 'replace'
     assert diffs[0].old_value == original_value
     assert diffs[0].new_value == new_value
 
 
+@st.composite
+def two_different_typed(draw):
+    """Draw a pair of YAML values whose Python types differ."""
+    value1 = draw(yaml_values)
+    # false == 0 and 1 == 1.0 in Python, and == decides what counts as a change
+    value2 = draw(yaml_values.filter(
+        lambda x: type(x) is not type(value1) and x != value1
+    ))
+    return value1, value2
+
+
 # **Feature: yaml-diff, Property 8: Type Change Detection**
 # **Validates: Requirements 7.3**
-@given(
-    value1=yaml_values,
-    value2=yaml_values
-)
-@settings(max_examples=100)
-def test_type_change_detection(value1, value2):
+@given(pair=two_different_typed())
+def test_type_change_detection(pair):
     """
     Property 8: Type Change Detection
     
     For any two YAML values at the same path where the types differ,
     the diff SHALL report a type change or replacement operation.
     """
-    # Only test when types actually differ
-    if type(value1) == type(value2):
-        return
+    value1, value2 = pair
     
     diffs = compute_diff(value1, value2)
     
     # Should have exactly one replace operation at root
     assert len(diffs) == 1, f"Expected 1 diff for type change, got {len(diffs)}"
     assert diffs[0].op == 'replace', f"Expected 'replace' op, got '{diffs[0].op}'"
-    assert diffs[0].path == [], f"Expected root path, got {diffs[0].path}"
+    assert diffs[0].path == (), f"Expected root path, got {diffs[0].path}"
     assert diffs[0].old_value == value1
     assert diffs[0].new_value == value2
 
 
-# **Feature: yaml-diff, Property 6: Exit Code Correctness**
-# **Validates: Requirements 6.3**
-@given(
-    value1=yaml_values,
-    value2=yaml_values
-)
-@settings(max_examples=100)
-def test_exit_code_correctness(value1, value2):
+# RFC 6902 operation names, and the subset that must carry a 'value' field
+_VALID_PATCH_OPS = frozenset({'add', 'remove', 'replace', 'move', 'copy', 'test'})
+_VALUE_PATCH_OPS = frozenset({'add', 'replace'})
+
+
+def assert_exit_code_correct(value1, value2):
     """
     Property 6: Exit Code Correctness
     
@@ -364,27 +395,15 @@ def test_exit_code_correctness(value1, value2):
     """
     exit_code = compute_exit_code(value1, value2)
     
-    # Canonicalize both values for comparison
-    canon1 = canonicalize(value1)
-    canon2 = canonicalize(value2)
-    
-    if canon1 == canon2:
+    # Dict equality ignores key order, so plain == matches the canonical
+    # comparison without re-walking both values through canonicalize
+    if value1 == value2:
         assert exit_code == 0, f"Expected exit code 0 for identical values, got {exit_code}"
     else:
         assert exit_code == 1, f"Expected exit code 1 for different values, got {exit_code}"
 
 
-import json as json_module
-
-
-# **Feature: yaml-diff, Property 7: JSON-Patch Validity**
-# **Validates: Requirements 5.2**
-@given(
-    old_value=yaml_values,
-    new_value=yaml_values
-)
-@settings(max_examples=100)
-def test_json_patch_validity(old_value, new_value):
+def assert_json_patch_valid(old_value, new_value):
     """
     Property 7: JSON-Patch Validity
     
@@ -395,33 +414,49 @@ def test_json_patch_validity(old_value, new_value):
     json_output = format_json_patch(diffs)
     
     # Must be valid JSON
-    parsed = json_module.loads(json_output)
+    parsed = json.loads(json_output)
     
     # Must be an array
     assert isinstance(parsed, list), f"JSON-patch must be an array, got {type(parsed)}"
     
     # Each operation must conform to RFC 6902
-    valid_ops = {'add', 'remove', 'replace', 'move', 'copy', 'test'}
-    
     for op in parsed:
         # Must be an object
         assert isinstance(op, dict), f"Each operation must be an object, got {type(op)}"
+        keys = op.keys()
         
         # Must have 'op' field
-        assert 'op' in op, "Operation must have 'op' field"
-        assert op['op'] in valid_ops, f"Invalid op: {op['op']}"
+        assert 'op' in keys, "Operation must have 'op' field"
+        op_name = op['op']
+        assert op_name in _VALID_PATCH_OPS, f"Invalid op: {op_name}"
         
         # Must have 'path' field
-        assert 'path' in op, "Operation must have 'path' field"
+        assert 'path' in keys, "Operation must have 'path' field"
         assert isinstance(op['path'], str), "Path must be a string"
         
         # 'add' and 'replace' must have 'value' field
-        if op['op'] in ('add', 'replace'):
-            assert 'value' in op, f"'{op['op']}' operation must have 'value' field"
+        if op_name in _VALUE_PATCH_OPS:
+            assert 'value' in keys, f"'{op_name}' operation must have 'value' field"
         
         # 'remove' should not have 'value' field (per RFC 6902)
-        if op['op'] == 'remove':
-            assert 'value' not in op, "'remove' operation should not have 'value' field"
+        if op_name == 'remove':
+            assert 'value' not in keys, "'remove' operation should not have 'value' field"
+
+
+# Properties 6 and 7 draw from the same pair space, so they share one
+# @given and one round of example generation and shrinking.
+# **Feature: yaml-diff, Property 6: Exit Code Correctness**
+# **Validates: Requirements 6.3**
+# **Feature: yaml-diff, Property 7: JSON-Patch Validity**
+# **Validates: Requirements 5.2**
+@given(
+    value1=yaml_values,
+    value2=yaml_values
+)
+def test_value_pair_properties(value1, value2):
+    """Properties 6 (exit code) and 7 (JSON-patch validity) over any value pair."""
+    assert_exit_code_correct(value1, value2)
+    assert_json_patch_valid(value1, value2)
 
 
 # =============================================================================
@@ -465,6 +500,32 @@ nested:
         # Should not raise
         check_unsupported_features(content, "test.yaml")
     
+    def test_checks_undecoded_bytes(self):
+        """Raw UTF-8 bytes should be checked too, including non-ASCII names."""
+        with pytest.raises(YamlDiffError) as exc_info:
+            check_unsupported_features("key: &ñame value".encode("utf-8"), "test.yaml")
+        assert "Anchors are not supported" in str(exc_info.value)
+        check_unsupported_features(b'key: "Tom & Jerry"', "test.yaml")
+    
+    @pytest.mark.parametrize("encoding", [
+        'utf-16', 'utf-16-le', 'utf-16-be', 'utf-32', 'utf-32-le', 'utf-32-be',
+    ])
+    def test_checks_wide_encodings(self, encoding):
+        """UTF-16/32 bytes, with or without a BOM, should be scanned as text."""
+        with pytest.raises(YamlDiffError) as exc_info:
+            check_unsupported_features("a: 1\nb: *x".encode(encoding), "test.yaml")
+        assert "Aliases are not supported" in str(exc_info.value)
+        check_unsupported_features("key: value".encode(encoding), "test.yaml")
+    
+    def test_cached_result_names_current_source(self):
+        """Repeated content should be rejected again, naming the new source."""
+        content = "key: *cached_alias"
+        with pytest.raises(YamlDiffError):
+            check_unsupported_features(content, "first.yaml")
+        with pytest.raises(YamlDiffError) as exc_info:
+            check_unsupported_features(content, "second.yaml")
+        assert "second.yaml" in str(exc_info.value)
+    
     def test_allows_ampersand_in_string(self):
         """Ampersand in quoted strings should be allowed."""
         content = 'key: "Tom & Jerry"'
@@ -472,6 +533,24 @@ nested:
         check_unsupported_features(content, "test.yaml")
 
 
+# =============================================================================
+# Shared fixture files
+# =============================================================================
+
+@pytest.fixture(scope="session")
+def yaml_files(tmp_path_factory):
+    """Directory of static YAML files, written once per test session."""
+    d = tmp_path_factory.mktemp("yaml_files")
+    (d / "good.yaml").write_text("key: value\nlist:\n  - item1\n  - item2")
+    (d / "value.yaml").write_text("key: value")
+    (d / "value_copy.yaml").write_text("key: value")
+    (d / "old.yaml").write_text("key: old")
+    (d / "new.yaml").write_text("key: new")
+    (d / "invalid.yaml").write_text("key: [unclosed")
+    (d / "anchor.yaml").write_text("key: &anchor value")
+    return d
+
+
 # =============================================================================
 # Unit Tests for load_yaml
 # =============================================================================
@@ -485,27 +564,71 @@ class TestLoadYaml:
             load_yaml("nonexistent_file.yaml")
         assert "File not found" in str(exc_info.value)
     
-    def test_invalid_yaml(self, tmp_path):
+    def test_utf16_anchor_rejected(self, tmp_path):
+        """A UTF-16 file with an anchor and alias should be rejected, not resolved."""
+        path = tmp_path / "wide.yaml"
+        path.write_bytes("a: &x 1\nb: *x\n".encode("utf-16"))
+        with pytest.raises(YamlDiffError) as exc_info:
+            load_yaml(str(path), cache=False)
+        assert "Anchors are not supported" in str(exc_info.value)
+    
+    def test_invalid_yaml(self):
         """Should raise YamlDiffError for invalid YAML."""
-        bad_yaml = tmp_path / "bad.yaml"
-        bad_yaml.write_text("key: [unclosed")
         with pytest.raises(YamlDiffError) as exc_info:
-            load_yaml(str(bad_yaml))
+            _parse_yaml("key: [unclosed", "bad.yaml")
         assert "YAML parse error" in str(exc_info.value)
     
-    def test_valid_yaml(self, tmp_path):
-        """Should parse valid YAML correctly."""
-        good_yaml = tmp_path / "good.yaml"
-        good_yaml.write_text("key: value\nlist:\n  - item1\n  - item2")
-        result = load_yaml(str(good_yaml))
+    def test_valid_yaml(self, yaml_files):
+        """Should read and parse a real YAML file correctly."""
+        result = load_yaml(str(yaml_files / "good.yaml"))
         assert result == {"key": "value", "list": ["item1", "item2"]}
     
-    def test_empty_file(self, tmp_path):
+    def test_empty_file(self):
         """Empty file should return None."""
-        empty_yaml = tmp_path / "empty.yaml"
-        empty_yaml.write_text("")
-        result = load_yaml(str(empty_yaml))
-        assert result is None
+        assert _parse_yaml("", "empty.yaml") is None
+    
+    def test_cached_until_file_changes(self, tmp_path):
+        """Unchanged file should reuse the cached parse; edits invalidate it."""
+        cached_yaml = tmp_path / "cached.yaml"
+        cached_yaml.write_text("key: value")
+        first = load_yaml(str(cached_yaml))
+        assert load_yaml(str(cached_yaml)) is first
+        
+        cached_yaml.write_text("key: changed")
+        assert load_yaml(str(cached_yaml)) == {"key": "changed"}
+    
+    def test_json_sidecar_cache(self, yaml_files, tmp_path, monkeypatch):
+        """With YAML_DIFF_CACHE_DIR set, parses are reused via JSON sidecars."""
+        monkeypatch.setenv(yaml_diff.CACHE_DIR_ENV, str(tmp_path))
+        monkeypatch.setattr(yaml_diff, '_YAML_CACHE', OrderedDict())
+        source = str(yaml_files / "good.yaml")
+        assert load_yaml(source) == {"key": "value", "list": ["item1", "item2"]}
+        
+        sidecars = list(tmp_path.glob("*.json"))
+        assert len(sidecars) == 1
+        
+        # A fresh process would read the sidecar instead of parsing
+        sidecars[0].write_text('{"key": "from sidecar"}')
+        monkeypatch.setattr(yaml_diff, '_YAML_CACHE', OrderedDict())
+        assert load_yaml(source) == {"key": "from sidecar"}
+        assert load_yaml(source, cache=False) == {"key": "value", "list": ["item1", "item2"]}
+    
+    def test_json_sidecar_skips_non_json_types(self, tmp_path, monkeypatch):
+        """Documents JSON cannot represent exactly should not get a sidecar."""
+        cache_dir = tmp_path / "cache"
+        monkeypatch.setenv(yaml_diff.CACHE_DIR_ENV, str(cache_dir))
+        dated = tmp_path / "dated.yaml"
+        dated.write_text("released: 2024-01-01\n1: one")
+        load_yaml(str(dated))
+        assert not list(cache_dir.glob("*.json"))
+    
+    def test_cache_evicts_least_recently_used(self, yaml_files, monkeypatch):
+        """Cache should hold at most _YAML_CACHE_SIZE documents."""
+        monkeypatch.setattr(yaml_diff, '_YAML_CACHE_SIZE', 1)
+        monkeypatch.setattr(yaml_diff, '_YAML_CACHE', OrderedDict())
+        first = load_yaml(str(yaml_files / "old.yaml"))
+        load_yaml(str(yaml_files / "new.yaml"))
+        assert load_yaml(str(yaml_files / "old.yaml")) is not first
 
 
 # =============================================================================
@@ -515,26 +638,43 @@ class TestLoadYaml:
 class TestEdgeCases:
     """Unit tests for edge case handling."""
     
-    def test_empty_file_returns_none(self, tmp_path):
+    def test_empty_file_returns_none(self):
         """Empty file should be treated as null value (Requirements 7.1)."""
-        empty_file = tmp_path / "empty.yaml"
-        empty_file.write_text("")
-        result = load_yaml(str(empty_file))
+        result = _parse_yaml("", "empty.yaml")
         assert result is None
     
-    def test_comment_only_file_returns_none(self, tmp_path):
+    def test_comment_only_file_returns_none(self):
         """Comment-only file should be treated as empty document (Requirements 7.2)."""
-        comment_file = tmp_path / "comments.yaml"
-        comment_file.write_text("# This is a comment\n# Another comment\n")
-        result = load_yaml(str(comment_file))
+        result = _parse_yaml("# This is a comment\n# Another comment\n", "comments.yaml")
         assert result is None
     
-    def test_empty_vs_empty_no_diff(self, tmp_path):
+    def test_python_tag_reported_as_custom_tag(self):
+        """Tags without a safe constructor should be reported as custom tags."""
+        with pytest.raises(YamlDiffError) as exc_info:
+            _parse_yaml("key: !!python/tuple [1, 2]", "tags.yaml")
+        assert "Custom tags are not supported: tags.yaml" in str(exc_info.value)
+    
+    def test_standard_tags_allowed(self):
+        """Standard YAML tags like !!str should still be accepted."""
+        assert _parse_yaml("key: !!str 1", "tags.yaml") == {"key": "1"}
+    
+    def test_empty_vs_empty_no_diff(self):
         """Two empty files should produce no diff."""
         diffs = compute_diff(None, None)
         assert diffs == []
     
-    def test_empty_vs_content_produces_diff(self, tmp_path):
+    def test_deep_nesting_beyond_recursion_limit(self):
+        """Nesting deeper than the recursion limit should still diff."""
+        depth = sys.getrecursionlimit() + 100
+        old, new = "a", "b"
+        for _ in range(depth):
+            old, new = {"k": old}, {"k": new}
+        
+        diffs = compute_diff(old, new)
+        assert len(diffs) == 1
+        assert diffs[0].path == ("k",) * depth
+    
+    def test_empty_vs_content_produces_diff(self):
         """Empty file vs file with content should produce diff."""
         diffs = compute_diff(None, {"key": "value"})
         assert len(diffs) == 1
@@ -542,7 +682,7 @@ class TestEdgeCases:
         assert diffs[0].old_value is None
         assert diffs[0].new_value == {"key": "value"}
     
-    def test_content_vs_empty_produces_diff(self, tmp_path):
+    def test_content_vs_empty_produces_diff(self):
         """File with content vs empty file should produce diff."""
         diffs = compute_diff({"key": "value"}, None)
         assert len(diffs) == 1
@@ -571,14 +711,14 @@ class TestEdgeCases:
         assert diffs == []
         
         # Modified deep value should be detected
-        import copy
-        modified = copy.deepcopy(deep)
-        modified["level1"]["level2"]["level3"]["level4"]["level5"]["level6"] = "changed"
+        modified = set_at_path(
+            deep, ["level1", "level2", "level3", "level4", "level5", "level6"], "changed"
+        )
         
         diffs = compute_diff(deep, modified)
         assert len(diffs) == 1
         assert diffs[0].op == "replace"
-        assert diffs[0].path == ["level1", "level2", "level3", "level4", "level5", "level6"]
+        assert diffs[0].path == ("level1", "level2", "level3", "level4", "level5", "level6")
         assert diffs[0].old_value == "deep_value"
         assert diffs[0].new_value == "changed"
     
@@ -591,14 +731,12 @@ class TestEdgeCases:
         assert diffs == []
         
         # Modified deep value should be detected
-        import copy
-        modified = copy.deepcopy(deep)
-        modified[0][0][0][0][0] = "changed"
+        modified = set_at_path(deep, ["0", "0", "0", "0", "0"], "changed")
         
         diffs = compute_diff(deep, modified)
         assert len(diffs) == 1
         assert diffs[0].op == "replace"
-        assert diffs[0].path == ["0", "0", "0", "0", "0"]
+        assert diffs[0].path == ("0", "0", "0", "0", "0")
     
     def test_mixed_deep_nesting(self):
         """Mixed maps and lists at deep nesting should work."""
@@ -612,28 +750,22 @@ class TestEdgeCases:
             ]
         }
         
-        import copy
-        modified = copy.deepcopy(deep)
-        modified["items"][0]["nested"][0]["value"] = 100
+        modified = set_at_path(deep, ["items", "0", "nested", "0", "value"], 100)
         
         diffs = compute_diff(deep, modified)
         assert len(diffs) == 1
-        assert diffs[0].path == ["items", "0", "nested", "0", "value"]
+        assert diffs[0].path == ("items", "0", "nested", "0", "value")
         assert diffs[0].old_value == 42
         assert diffs[0].new_value == 100
     
-    def test_whitespace_only_file(self, tmp_path):
+    def test_whitespace_only_file(self):
         """File with only whitespace (spaces/newlines) should be treated as empty."""
-        ws_file = tmp_path / "whitespace.yaml"
-        ws_file.write_text("   \n\n   ")
-        result = load_yaml(str(ws_file))
+        result = _parse_yaml("   \n\n   ", "whitespace.yaml")
         assert result is None
     
-    def test_comment_with_whitespace(self, tmp_path):
+    def test_comment_with_whitespace(self):
         """File with comments and whitespace should be treated as empty."""
-        file = tmp_path / "mixed.yaml"
-        file.write_text("   \n# comment\n   \n# another\n")
-        result = load_yaml(str(file))
+        result = _parse_yaml("   \n# comment\n   \n# another\n", "mixed.yaml")
         assert result is None
 
 
@@ -644,29 +776,20 @@ class TestEdgeCases:
 class TestPathToJsonPointer:
     """Unit tests for JSON pointer conversion."""
     
-    def test_empty_path(self):
-        """Empty path should return empty string."""
-        assert path_to_json_pointer([]) == ''
-    
-    def test_simple_path(self):
-        """Simple path should be converted correctly."""
-        assert path_to_json_pointer(['foo', 'bar']) == '/foo/bar'
-    
-    def test_path_with_index(self):
-        """Path with numeric index should work."""
-        assert path_to_json_pointer(['items', '0', 'name']) == '/items/0/name'
-    
-    def test_escape_tilde(self):
-        """Tilde should be escaped as ~0."""
-        assert path_to_json_pointer(['key~name']) == '/key~0name'
-    
-    def test_escape_slash(self):
-        """Slash should be escaped as ~1."""
-        assert path_to_json_pointer(['key/name']) == '/key~1name'
-    
-    def test_escape_both(self):
-        """Both tilde and slash should be escaped correctly."""
-        assert path_to_json_pointer(['a~b/c']) == '/a~0b~1c'
+    @pytest.mark.parametrize("path,expected", [
+        ([], ''),                                  # empty path
+        (['foo', 'bar'], '/foo/bar'),              # simple path
+        (['items', '0', 'name'], '/items/0/name'), # numeric index
+        (['key~name'], '/key~0name'),              # tilde escaped as ~0
+        (['key/name'], '/key~1name'),              # slash escaped as ~1
+        (['a~b/c'], '/a~0b~1c'),                   # both escaped in order
+        (['a', 'b/c', 'd'], '/a/b~1c/d'),          # escape among plain segments
+        (['items', 0], '/items/0'),                # non-str segments via str()
+        ([1, 'a/b'], '/1/a~1b'),                   # non-str segment, slow path
+    ])
+    def test_json_pointer(self, path, expected):
+        """Path segments should convert to an escaped RFC 6901 pointer."""
+        assert path_to_json_pointer(path) == expected
 
 
 class TestFormatHuman:
@@ -678,21 +801,21 @@ class TestFormatHuman:
     
     def test_add_operation(self):
         """Add operation should show + prefix."""
-        diffs = [DiffOp('add', ['key'], None, 'value')]
+        diffs = [DiffOp('add', ('key',), None, 'value')]
         output = format_human(diffs, use_color=False)
         assert '/key:' in output
         assert '+ value' in output
     
     def test_remove_operation(self):
         """Remove operation should show - prefix."""
-        diffs = [DiffOp('remove', ['key'], 'old_value', None)]
+        diffs = [DiffOp('remove', ('key',), 'old_value', None)]
         output = format_human(diffs, use_color=False)
         assert '/key:' in output
         assert '- old_value' in output
     
     def test_replace_operation(self):
         """Replace operation should show both - and +."""
-        diffs = [DiffOp('replace', ['key'], 'old', 'new')]
+        diffs = [DiffOp('replace', ('key',), 'old', 'new')]
         output = format_human(diffs, use_color=False)
         assert '/key:' in output
         assert '- old' in output
@@ -700,75 +823,91 @@ class TestFormatHuman:
     
     def test_with_color(self):
         """Color codes should be included when use_color=True."""
-        diffs = [DiffOp('add', ['key'], None, 'value')]
+        diffs = [DiffOp('add', ('key',), None, 'value')]
         output = format_human(diffs, use_color=True)
         assert '\033[32m' in output  # green
         assert '\033[0m' in output   # reset
     
     def test_null_value(self):
         """None should be formatted as 'null'."""
-        diffs = [DiffOp('replace', ['key'], None, 'value')]
+        diffs = [DiffOp('replace', ('key',), None, 'value')]
         output = format_human(diffs, use_color=False)
         assert '- null' in output
     
     def test_bool_value(self):
         """Booleans should be formatted as 'true'/'false'."""
-        diffs = [DiffOp('replace', ['key'], True, False)]
+        diffs = [DiffOp('replace', ('key',), True, False)]
         output = format_human(diffs, use_color=False)
         assert '- true' in output
         assert '+ false' in output
     
     def test_dict_value(self):
         """Dict values should be JSON formatted."""
-        diffs = [DiffOp('add', ['key'], None, {'nested': 'value'})]
+        diffs = [DiffOp('add', ('key',), None, {'nested': 'value'})]
         output = format_human(diffs, use_color=False)
         assert 'nested' in output
         assert 'value' in output
     
     def test_root_path(self):
         """Empty path should show as '/'."""
-        diffs = [DiffOp('replace', [], 'old', 'new')]
+        diffs = [DiffOp('replace', (), 'old', 'new')]
         output = format_human(diffs, use_color=False)
         assert '/:' in output
 
 
+@pytest.fixture(scope="module")
+def sample_diffs():
+    """Pre-built single-operation diffs shared by the formatter tests."""
+    return {
+        'add': DiffOp('add', ('key',), None, 'value'),
+        'remove': DiffOp('remove', ('key',), 'old', None),
+        'replace': DiffOp('replace', ('key',), 'old', 'new'),
+    }
+
+
 class TestFormatJsonPatch:
     """Unit tests for JSON-patch output formatting."""
     
     def test_empty_diffs(self):
         """Empty diff list should return empty JSON array."""
         output = format_json_patch([])
-        assert json_module.loads(output) == []
-    
-    def test_add_operation(self):
-        """Add operation should have correct structure."""
-        diffs = [DiffOp('add', ['key'], None, 'value')]
-        output = format_json_patch(diffs)
-        parsed = json_module.loads(output)
-        assert len(parsed) == 1
-        assert parsed[0]['op'] == 'add'
-        assert parsed[0]['path'] == '/key'
-        assert parsed[0]['value'] == 'value'
-    
-    def test_remove_operation(self):
-        """Remove operation should not have value field."""
-        diffs = [DiffOp('remove', ['key'], 'old', None)]
-        output = format_json_patch(diffs)
-        parsed = json_module.loads(output)
-        assert len(parsed) == 1
-        assert parsed[0]['op'] == 'remove'
-        assert parsed[0]['path'] == '/key'
-        assert 'value' not in parsed[0]
-    
-    def test_replace_operation(self):
-        """Replace operation should have new value."""
-        diffs = [DiffOp('replace', ['key'], 'old', 'new')]
-        output = format_json_patch(diffs)
-        parsed = json_module.loads(output)
-        assert len(parsed) == 1
-        assert parsed[0]['op'] == 'replace'
-        assert parsed[0]['path'] == '/key'
-        assert parsed[0]['value'] == 'new'
+        assert json.loads(output) == []
+    
+    @pytest.mark.parametrize("op,expected", [
+        ('add', {'op': 'add', 'path': '/key', 'value': 'value'}),
+        # remove carries no value field
+        ('remove', {'op': 'remove', 'path': '/key'}),
+        # replace carries the new value
+        ('replace', {'op': 'replace', 'path': '/key', 'value': 'new'}),
+    ])
+    def test_operation(self, sample_diffs, op, expected):
+        """Each operation should serialize to its RFC 6902 structure."""
+        output = format_json_patch([sample_diffs[op]])
+        assert json.loads(output) == [expected]
+    
+    @pytest.mark.parametrize("value", [
+        {1: ['ñ', 2 ** 70]},                           # int key, non-ASCII, wide int
+        {'nan': float('nan'), 'inf': [float('-inf')]}, # orjson would write null
+        [1e16, 1e-05, 0.5, {2.5: True, None: '\x7f'}],  # exponents, odd keys, DEL
+    ])
+    def test_stdlib_fallback_matches(self, value, monkeypatch):
+        """Output should be json.dumps(indent=2) text, with or without orjson."""
+        diffs = [DiffOp('add', ('k',), None, value)]
+        expected = json.dumps(
+            [{'op': 'add', 'path': '/k', 'value': canonicalize(value)}], indent=2
+        )
+        assert format_json_patch(diffs) == expected
+        monkeypatch.setattr(yaml_diff, 'orjson', None)
+        assert format_json_patch(diffs) == expected
+    
+    def test_date_value_rejected_either_way(self, monkeypatch):
+        """A date value should behave the same with or without orjson."""
+        diffs = [DiffOp('add', ('k',), None, datetime.date(2024, 1, 1))]
+        with pytest.raises(TypeError):
+            format_json_patch(diffs)
+        monkeypatch.setattr(yaml_diff, 'orjson', None)
+        with pytest.raises(TypeError):
+            format_json_patch(diffs)
 
 
 class TestShouldUseColor:
@@ -789,95 +928,60 @@ class TestShouldUseColor:
 # Unit Tests for CLI (main function)
 # =============================================================================
 
+def run_cli(*args):
+    """Run the CLI in-process, returning (exit code, stdout, stderr)."""
+    out, err = io.StringIO(), io.StringIO()
+    code = main([str(arg) for arg in args], out, err)
+    return code, out.getvalue(), err.getvalue()
+
+
 class TestCLI:
     """Unit tests for CLI functionality."""
     
-    def test_identical_files_exit_0(self, tmp_path):
+    def test_identical_files_exit_0(self, yaml_files):
         """Identical files should exit with code 0."""
-        file1 = tmp_path / "file1.yaml"
-        file2 = tmp_path / "file2.yaml"
-        file1.write_text("key: value")
-        file2.write_text("key: value")
-        
-        import subprocess
-        result = subprocess.run(
-            ['python', 'yaml_diff.py', str(file1), str(file2)],
-            capture_output=True,
-            text=True
-        )
-        assert result.returncode == 0
-        assert result.stdout == ''
+        code, out, _ = run_cli(yaml_files / "value.yaml", yaml_files / "value_copy.yaml")
+        assert code == 0
+        assert out == ''
     
-    def test_different_files_exit_1(self, tmp_path):
+    def test_different_files_exit_1(self, yaml_files):
         """Different files should exit with code 1."""
-        file1 = tmp_path / "file1.yaml"
-        file2 = tmp_path / "file2.yaml"
-        file1.write_text("key: old")
-        file2.write_text("key: new")
-        
-        import subprocess
-        result = subprocess.run(
-            ['python', 'yaml_diff.py', str(file1), str(file2)],
-            capture_output=True,
-            text=True
-        )
-        assert result.returncode == 1
-        assert '/key:' in result.stdout
+        code, out, _ = run_cli(yaml_files / "old.yaml", yaml_files / "new.yaml")
+        assert code == 1
+        assert '/key:' in out
     
-    def test_file_not_found_exit_2(self, tmp_path):
+    def test_file_not_found_exit_2(self, yaml_files):
         """Missing file should exit with code 2."""
-        file1 = tmp_path / "exists.yaml"
-        file1.write_text("key: value")
-        
-        import subprocess
-        result = subprocess.run(
-            ['python', 'yaml_diff.py', str(file1), 'nonexistent.yaml'],
-            capture_output=True,
-            text=True
-        )
-        assert result.returncode == 2
-        assert 'error' in result.stderr.lower()
+        code, _, err = run_cli(yaml_files / "value.yaml", 'nonexistent.yaml')
+        assert code == 2
+        assert 'error' in err.lower()
     
-    def test_json_patch_flag(self, tmp_path):
+    def test_json_patch_flag(self, yaml_files):
         """--json-patch flag should output JSON format."""
-        file1 = tmp_path / "file1.yaml"
-        file2 = tmp_path / "file2.yaml"
-        file1.write_text("key: old")
-        file2.write_text("key: new")
-        
-        import subprocess
-        result = subprocess.run(
-            ['python', 'yaml_diff.py', str(file1), str(file2), '--json-patch'],
-            capture_output=True,
-            text=True
-        )
-        assert result.returncode == 1
-        parsed = json_module.loads(result.stdout)
+        code, out, _ = run_cli(yaml_files / "old.yaml", yaml_files / "new.yaml", '--json-patch')
+        assert code == 1
+        parsed = json.loads(out)
         assert isinstance(parsed, list)
         assert parsed[0]['op'] == 'replace'
     
-    def test_short_json_flag(self, tmp_path):
+    def test_short_json_flag(self, yaml_files):
         """-j flag should work same as --json-patch."""
-        file1 = tmp_path / "file1.yaml"
-        file2 = tmp_path / "file2.yaml"
-        file1.write_text("key: old")
-        file2.write_text("key: new")
-        
-        import subprocess
-        result = subprocess.run(
-            ['python', 'yaml_diff.py', str(file1), str(file2), '-j'],
-            capture_output=True,
-            text=True
-        )
-        assert result.returncode == 1
-        parsed = json_module.loads(result.stdout)
+        code, out, _ = run_cli(yaml_files / "old.yaml", yaml_files / "new.yaml", '-j')
+        assert code == 1
+        parsed = json.loads(out)
         assert isinstance(parsed, list)
     
+    def test_stdin_input(self, yaml_files, monkeypatch):
+        """'-' should read the first file from stdin."""
+        monkeypatch.setattr(sys, 'stdin', io.StringIO("key: old"))
+        code, out, _ = run_cli('-', yaml_files / "new.yaml")
+        assert code == 1
+        assert '+ new' in out
+    
     def test_help_flag(self):
-        """--help should show usage information."""
-        import subprocess
+        """--help should show usage information (runs the script end to end)."""
         result = subprocess.run(
-            ['python', 'yaml_diff.py', '--help'],
+            [sys.executable, 'yaml_diff.py', '--help'],
             capture_output=True,
             text=True
         )
@@ -885,37 +989,51 @@ class TestCLI:
         assert 'usage' in result.stdout.lower()
         assert 'yaml-diff' in result.stdout.lower()
     
-    def test_invalid_yaml_exit_2(self, tmp_path):
+    def test_missing_argument_exit_2(self, yaml_files):
+        """A usage error should return 2 and print usage to the given stderr."""
+        code, out, err = run_cli(yaml_files / "value.yaml")
+        assert code == 2
+        assert out == ''
+        assert 'usage' in err.lower()
+        assert 'file2' in err
+    
+    def test_help_flag_in_process(self):
+        """--help should print to the given stdout and return 0."""
+        code, out, err = run_cli('--help')
+        assert code == 0
+        assert 'usage' in out.lower()
+        assert err == ''
+    
+    def test_invalid_yaml_exit_2(self, yaml_files):
         """Invalid YAML should exit with code 2."""
-        file1 = tmp_path / "valid.yaml"
-        file2 = tmp_path / "invalid.yaml"
-        file1.write_text("key: value")
-        file2.write_text("key: [unclosed")
-        
-        import subprocess
-        result = subprocess.run(
-            ['python', 'yaml_diff.py', str(file1), str(file2)],
-            capture_output=True,
-            text=True
-        )
-        assert result.returncode == 2
-        assert 'error' in result.stderr.lower()
+        code, _, err = run_cli(yaml_files / "value.yaml", yaml_files / "invalid.yaml")
+        assert code == 2
+        assert 'error' in err.lower()
     
-    def test_anchor_rejected_exit_2(self, tmp_path):
+    def test_anchor_rejected_exit_2(self, yaml_files):
         """YAML with anchors should exit with code 2."""
-        file1 = tmp_path / "normal.yaml"
-        file2 = tmp_path / "anchor.yaml"
-        file1.write_text("key: value")
-        file2.write_text("key: &anchor value")
-        
-        import subprocess
-        result = subprocess.run(
-            ['python', 'yaml_diff.py', str(file1), str(file2)],
-            capture_output=True,
-            text=True
-        )
-        assert result.returncode == 2
-        assert 'anchor' in result.stderr.lower()
+        code, _, err = run_cli(yaml_files / "value.yaml", yaml_files / "anchor.yaml")
+        assert code == 2
+        assert 'anchor' in err.lower()
+    
+    def test_mixed_key_types(self, tmp_path):
+        """Maps mixing int and str keys should diff instead of erroring."""
+        (tmp_path / "a.yaml").write_text("1: one\nkey: old")
+        (tmp_path / "b.yaml").write_text("1: one\nkey: new")
+        code, out, _ = run_cli(tmp_path / "a.yaml", tmp_path / "b.yaml", '-j')
+        assert code == 1
+        assert json.loads(out) == [{'op': 'replace', 'path': '/key', 'value': 'new'}]
+    
+    def test_payload_keys_sorted(self, tmp_path):
+        """Maps inside op values should print with sorted keys."""
+        (tmp_path / "a.yaml").write_text("k: 1")
+        (tmp_path / "b.yaml").write_text("k:\n  aa: 1\n  '': 2")
+        code, out, _ = run_cli(tmp_path / "a.yaml", tmp_path / "b.yaml", '-j')
+        assert code == 1
+        assert list(json.loads(out)[0]['value']) == ['', 'aa']
+        code, out, _ = run_cli(tmp_path / "a.yaml", tmp_path / "b.yaml", '--no-color')
+        assert code == 1
+        assert out.index('"": 2') < out.index('"aa": 1')
 
 
 class TestCanonicalizeFunction:
@@ -940,6 +1058,11 @@ class TestCanonicalizeFunction:
         assert list(result.keys()) == ['a', 'b']
         assert list(result['b'].keys()) == ['a', 'z']
     
+    def test_mixed_key_types_sorted_as_strings(self):
+        """Int and str keys should sort together by their string form."""
+        result = canonicalize({'b': 1, 10: 2, 2: 3})
+        assert list(result.keys()) == [10, 2, 'b']
+    
     def test_primitives_unchanged(self):
         """Primitives should pass through unchanged."""
         assert canonicalize(42) == 42
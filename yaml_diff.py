@@ -18,72 +18,286 @@ Exit codes:
     2 - Error (parse failure, file not found, invalid args)
 """
 
+import os
+import re
 import sys
 import json
+import stat
+import codecs
+import hashlib
 import argparse
-from dataclasses import dataclass
-from typing import Any, List, Optional
+import contextlib
+import tempfile
+from collections import OrderedDict
+from typing import Any, List, NamedTuple, Optional, Sequence, TextIO, Tuple, Union
 
 import yaml
 
+# Optional C JSON encoder; the stdlib json module is used when it is missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Prefer the libyaml-backed C loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
 
 class YamlDiffError(Exception):
     """Custom exception for yaml-diff specific errors."""
     pass
 
 
-@dataclass
-class DiffOp:
-    """Represents a single diff operation."""
+class _StrictLoader(_SafeLoader):
+    """Safe loader that reports any tag without a constructor as a custom tag."""
+    
+    source_name = '<unknown>'
+    
+    def construct_undefined(self, node):
+        raise YamlDiffError(
+            _UNSUPPORTED_MESSAGES['tag'].format(source=self.source_name)
+        )
+
+
+_StrictLoader.add_constructor(None, _StrictLoader.construct_undefined)
+
+
+class DiffOp(NamedTuple):
+    """Represents a single diff operation (immutable and slot-sized)."""
     op: str  # 'add', 'remove', 'replace'
-    path: List[str]  # JSON pointer path segments
+    path: Tuple[str, ...]  # JSON pointer path segments
     old_value: Any = None  # Previous value (for remove/replace)
     new_value: Any = None  # New value (for add/replace)
 
 
-def check_unsupported_features(content: str, source_name: str) -> None:
+# Unsupported features, matched in a single pass over the content. Each
+# sigil must sit at the start of a value position (line start, whitespace,
+# '[', '{' or ','):
+#   anchor - & followed by word characters (&name)
+#   alias  - * followed by word characters (*name)
+#   tag    - single ! followed by a non-! character (standard !! tags are ok)
+_UNSUPPORTED_RE = re.compile(
+    r'(?:^|[\s\[\{,])(?:(?P<anchor>&\w+)|(?P<alias>\*\w+)|(?P<tag>![^!\s]))',
+    re.MULTILINE
+)
+# Same pattern for raw bytes; \w is ASCII-only there, so also accept any
+# non-ASCII byte as part of a name to catch UTF-8 names like &ñame
+_UNSUPPORTED_BYTES_RE = re.compile(
+    rb'(?:^|[\s\[\{,])'
+    rb'(?:(?P<anchor>&[\w\x80-\xff]+)|(?P<alias>\*[\w\x80-\xff]+)|(?P<tag>![^!\s]))',
+    re.MULTILINE
+)
+
+# Error message for each named group of _UNSUPPORTED_RE
+_UNSUPPORTED_MESSAGES = {
+    'anchor': "Anchors are not supported: {source}\n"
+              "  yaml-diff does not support YAML anchors (&) and aliases (*)",
+    'alias': "Aliases are not supported: {source}\n"
+             "  yaml-diff does not support YAML anchors (&) and aliases (*)",
+    'tag': "Custom tags are not supported: {source}\n"
+           "  yaml-diff does not support custom YAML tags (!)",
+}
+
+
+# Recent check results keyed by whether the content was bytes and its blake2b
+# digest: the name of the first unsupported feature found, or None if clean
+_CHECK_CACHE_SIZE = 64
+_CHECK_CACHE: 'OrderedDict[Tuple[bool, bytes], Optional[str]]' = OrderedDict()
+
+
+def _wide_codec(content: bytes) -> Optional[str]:
+    """
+    Name the codec of UTF-16 or UTF-32 content, detected as in YAML 1.2 (5.2).
+    
+    Returns None for UTF-8, the only encoding the bytes pattern can scan.
+    """
+    if content.startswith((codecs.BOM_UTF32_BE, codecs.BOM_UTF32_LE)):
+        return 'utf-32'
+    if content.startswith((codecs.BOM_UTF16_BE, codecs.BOM_UTF16_LE)):
+        return 'utf-16'
+    
+    # Without a BOM, the NUL bytes around the first ASCII character tell
+    head = content[:4]
+    if head[:3] == b'\x00\x00\x00':
+        return 'utf-32-be'
+    if head[1:4] == b'\x00\x00\x00':
+        return 'utf-32-le'
+    if head[:1] == b'\x00':
+        return 'utf-16-be'
+    if head[1:2] == b'\x00':
+        return 'utf-16-le'
+    return None
+
+
+def check_unsupported_features(content: Union[str, bytes], source_name: str) -> None:
     """
     Check for unsupported YAML features before parsing.
     
+    Results are memoized by content digest, so identical content loaded from
+    several paths is only scanned once.
+    
     Args:
-        content: Raw YAML content string
+        content: Raw YAML content, as text or as undecoded bytes
         source_name: Name of the source for error messages
         
     Raises:
         YamlDiffError: If anchors, aliases, or custom tags are detected
     """
-    import re
-    
-    # Check for anchors (&name) - but not & in strings
-    # Look for & followed by word characters at start of value position
-    if re.search(r'(?:^|[\s\[\{,])&\w+', content, re.MULTILINE):
+    if isinstance(content, bytes):
+        # The bytes pattern cannot see '&x' spelled as '&\x00x\x00', so
+        # UTF-16/32 content is decoded and scanned as text
+        codec = _wide_codec(content)
+        if codec is not None:
+            content = content.decode(codec, errors='replace')
+    
+    if isinstance(content, bytes):
+        sigils, pattern = (b'&', b'*', b'!'), _UNSUPPORTED_BYTES_RE
+    else:
+        sigils, pattern = ('&', '*', '!'), _UNSUPPORTED_RE
+    
+    # Fast path: none of the sigils appear, so nothing can match
+    if not any(sigil in content for sigil in sigils):
+        return
+    
+    # A real digest, not hash(): a collision here would skip the check
+    is_bytes = isinstance(content, bytes)
+    data = content if is_bytes else content.encode('utf-8', 'surrogatepass')
+    key = (is_bytes, hashlib.blake2b(data, digest_size=16).digest())
+    if key in _CHECK_CACHE:
+        feature = _CHECK_CACHE[key]
+    else:
+        # Find the first unsupported feature in the content
+        match = pattern.search(content)
+        feature = match.lastgroup if match else None
+        _CHECK_CACHE[key] = feature
+        if len(_CHECK_CACHE) > _CHECK_CACHE_SIZE:
+            _CHECK_CACHE.popitem(last=False)
+    
+    if feature is not None:
         raise YamlDiffError(
-            f"Anchors are not supported: {source_name}\n"
-            "  yaml-diff does not support YAML anchors (&) and aliases (*)"
+            _UNSUPPORTED_MESSAGES[feature].format(source=source_name)
         )
+
+
+def _parse_yaml(content: Union[str, bytes], source: str) -> Any:
+    """
+    Validate and parse YAML content that has already been read.
     
-    # Check for aliases (*name) - but not * in strings
-    if re.search(r'(?:^|[\s\[\{,])\*\w+', content, re.MULTILINE):
-        raise YamlDiffError(
-            f"Aliases are not supported: {source_name}\n"
-            "  yaml-diff does not support YAML anchors (&) and aliases (*)"
-        )
+    Bytes are handed to PyYAML undecoded, letting it detect the encoding.
     
-    # Check for custom tags (!tag) - but not !! (standard tags are ok)
-    # Custom tags start with single ! followed by non-! character
-    if re.search(r'(?:^|[\s\[\{,])![^!\s]', content, re.MULTILINE):
-        raise YamlDiffError(
-            f"Custom tags are not supported: {source_name}\n"
-            "  yaml-diff does not support custom YAML tags (!)"
-        )
+    Args:
+        content: Raw YAML content, as text or bytes
+        source: Name of the source for error messages
+        
+    Returns:
+        Parsed YAML as Python object (dict, list, or primitive)
+        
+    Raises:
+        YamlDiffError: On unsupported features or parse failure
+    """
+    # Check for unsupported features before parsing; libyaml composes nodes
+    # in C, so anchors and aliases cannot be caught by the loader itself
+    check_unsupported_features(content, source)
+    
+    loader = _StrictLoader(content)
+    loader.source_name = source
+    try:
+        return loader.get_single_data()
+    except yaml.YAMLError as e:
+        raise YamlDiffError(f"YAML parse error in '{source}': {e}")
+    finally:
+        loader.dispose()
+
+
+# Directory for JSON sidecars of parsed documents; the sidecar cache is
+# disabled unless this environment variable is set
+CACHE_DIR_ENV = 'YAML_DIFF_CACHE_DIR'
+
+# Marks an absent value, such as a sidecar cache miss or a key present on
+# only one side of a diff (None is a valid YAML value, so it cannot)
+_MISSING = object()
+
+
+def _sidecar_path(content: Union[str, bytes]) -> Optional[str]:
+    """Return the JSON sidecar path for content, or None if caching is off."""
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    if not cache_dir:
+        return None
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+    return os.path.join(cache_dir, digest + '.json')
+
+
+def _is_json_safe(data: Any) -> bool:
+    """Check that data survives a JSON round trip unchanged."""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            if not all(type(key) is str for key in value):
+                return False
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+        elif not (value is None or isinstance(value, (str, int, float))):
+            return False
+    return True
+
+
+def _read_sidecar(path: str) -> Any:
+    """Load a JSON sidecar, returning _MISSING if absent or unreadable."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return _MISSING
 
 
-def load_yaml(source: str) -> Any:
+def _write_sidecar(path: str, data: Any) -> None:
+    """Atomically write data as a JSON sidecar; failures are ignored."""
+    if not _is_json_safe(data):
+        return
+    try:
+        cache_dir = os.path.dirname(path)
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError:
+        pass
+
+
+# LRU of parsed documents keyed by (path, st_mtime_ns, st_size)
+_YAML_CACHE_SIZE = 100
+_YAML_CACHE: 'OrderedDict[Tuple[str, int, int], Any]' = OrderedDict()
+
+
+def load_yaml(source: str, cache: bool = True) -> Any:
     """
     Load YAML from file path or stdin.
     
+    Parsed regular files are kept in an in-process LRU cache keyed by path,
+    modification time and size, so loading an unchanged file again returns
+    the same object (callers must not mutate it). Stdin and other
+    non-regular files are never cached in-process.
+    
+    When YAML_DIFF_CACHE_DIR is set, documents are also stored there as
+    JSON sidecars keyed by a hash of the content, so later processes can
+    skip YAML parsing. Only documents that round-trip through JSON
+    unchanged are written.
+    
     Args:
         source: File path or '-' for stdin
+        cache: Whether to read and write the caches
         
     Returns:
         Parsed YAML as Python object (dict, list, or primitive)
@@ -91,11 +305,20 @@ def load_yaml(source: str) -> Any:
     Raises:
         YamlDiffError: On file not found, read error, or parse failure
     """
+    cache_key = None
     try:
         if source == '-':
-            content = sys.stdin.read()
+            # Prefer the raw byte stream when stdin has one
+            stdin = getattr(sys.stdin, 'buffer', sys.stdin)
+            content = stdin.read()
         else:
-            with open(source, 'r', encoding='utf-8') as f:
+            st = os.stat(source)
+            if cache and stat.S_ISREG(st.st_mode):
+                cache_key = (source, st.st_mtime_ns, st.st_size)
+                if cache_key in _YAML_CACHE:
+                    _YAML_CACHE.move_to_end(cache_key)
+                    return _YAML_CACHE[cache_key]
+            with open(source, 'rb') as f:
                 content = f.read()
     except FileNotFoundError:
         raise YamlDiffError(f"File not found: {source}")
@@ -104,19 +327,27 @@ def load_yaml(source: str) -> Any:
     except IOError as e:
         raise YamlDiffError(f"Cannot read file '{source}': {e}")
     
-    # Check for unsupported features before parsing
-    check_unsupported_features(content, source)
-    
-    try:
-        return yaml.safe_load(content)
-    except yaml.YAMLError as e:
-        raise YamlDiffError(f"YAML parse error in '{source}': {e}")
+    sidecar = _sidecar_path(content) if cache else None
+    data = _read_sidecar(sidecar) if sidecar else _MISSING
+    if data is _MISSING:
+        data = _parse_yaml(content, source)
+        if sidecar:
+            _write_sidecar(sidecar, data)
+    
+    if cache_key is not None:
+        _YAML_CACHE[cache_key] = data
+        if len(_YAML_CACHE) > _YAML_CACHE_SIZE:
+            _YAML_CACHE.popitem(last=False)
+    return data
 
 
 def canonicalize(data: Any) -> Any:
     """
     Recursively sort dict keys and normalize types for consistent comparison.
     
+    Keys are ordered by their string form, the order compute_diff visits
+    them in, so maps mixing int and str keys sort too.
+    
     Args:
         data: YAML value (dict, list, or primitive)
         
@@ -124,13 +355,23 @@ def canonicalize(data: Any) -> Any:
         Canonicalized value with sorted dict keys
     """
     if isinstance(data, dict):
-        return {k: canonicalize(v) for k, v in sorted(data.items())}
+        return {k: canonicalize(data[k]) for k in sorted(data, key=str)}
     if isinstance(data, list):
         return [canonicalize(item) for item in data]
     return data
 
 
-def diff_primitives(old: Any, new: Any, path: List[str]) -> List[DiffOp]:
+# Shared root path, and interned segments for the first list indices
+_EMPTY_PATH: Tuple[str, ...] = ()
+_INDEX_SEGMENTS = tuple(sys.intern(str(i)) for i in range(256))
+
+
+def _index_segment(i: int) -> str:
+    """Return the path segment for list index i, interned for small indices."""
+    return _INDEX_SEGMENTS[i] if i < 256 else sys.intern(str(i))
+
+
+def diff_primitives(old: Any, new: Any, path: Tuple[str, ...]) -> List[DiffOp]:
     """
     Compare primitive values (str, int, float, bool, None).
     
@@ -147,7 +388,7 @@ def diff_primitives(old: Any, new: Any, path: List[str]) -> List[DiffOp]:
     return [DiffOp('replace', path, old, new)]
 
 
-def diff_maps(old: dict, new: dict, path: List[str]) -> List[DiffOp]:
+def diff_maps(old: dict, new: dict, path: Tuple[str, ...]) -> List[DiffOp]:
     """
     Compare two dicts, finding added/removed/changed keys.
     
@@ -159,26 +400,10 @@ def diff_maps(old: dict, new: dict, path: List[str]) -> List[DiffOp]:
     Returns:
         List of DiffOp objects for all differences
     """
-    diffs = []
-    all_keys = set(old.keys()) | set(new.keys())
-    
-    for key in sorted(all_keys, key=str):
-        key_path = path + [str(key)]
-        
-        if key not in old:
-            # Key added in new
-            diffs.append(DiffOp('add', key_path, None, new[key]))
-        elif key not in new:
-            # Key removed from old
-            diffs.append(DiffOp('remove', key_path, old[key], None))
-        elif old[key] != new[key]:
-            # Key exists in both but values differ - recurse
-            diffs.extend(compute_diff(old[key], new[key], key_path))
-    
-    return diffs
+    return compute_diff(old, new, path)
 
 
-def diff_lists(old: list, new: list, path: List[str]) -> List[DiffOp]:
+def diff_lists(old: list, new: list, path: Tuple[str, ...]) -> List[DiffOp]:
     """
     Compare two lists by index position.
     
@@ -190,81 +415,209 @@ def diff_lists(old: list, new: list, path: List[str]) -> List[DiffOp]:
     Returns:
         List of DiffOp objects for all differences
     """
-    diffs = []
-    max_len = max(len(old), len(new))
-    
-    for i in range(max_len):
-        idx_path = path + [str(i)]
-        
-        if i >= len(old):
-            # Element added in new
-            diffs.append(DiffOp('add', idx_path, None, new[i]))
-        elif i >= len(new):
-            # Element removed from old
-            diffs.append(DiffOp('remove', idx_path, old[i], None))
-        elif old[i] != new[i]:
-            # Element exists in both but values differ - recurse
-            diffs.extend(compute_diff(old[i], new[i], idx_path))
-    
-    return diffs
+    return compute_diff(old, new, path)
+
+
+def _push_map_children(old: dict, new: dict, path: Tuple[str, ...], stack: list) -> None:
+    """Queue one frame per key of two dicts, in reverse so keys pop sorted."""
+    # Local aliases skip an attribute lookup per key
+    old_get = old.get
+    new_get = new.get
+    push = stack.append
+    for key in reversed(sorted(old.keys() | new.keys(), key=str)):
+        # A key missing on one side is queued as _MISSING (add or remove)
+        push((old_get(key, _MISSING), new_get(key, _MISSING), path, str(key)))
+
+
+def _push_list_children(old: list, new: list, path: Tuple[str, ...], stack: list) -> None:
+    """Queue one frame per index of two lists, in reverse so indices pop in order."""
+    old_len = len(old)
+    new_len = len(new)
+    push = stack.append
+    for i in reversed(range(max(old_len, new_len))):
+        push((
+            old[i] if i < old_len else _MISSING,
+            new[i] if i < new_len else _MISSING,
+            path,
+            _index_segment(i),
+        ))
+
+
+# How compute_diff expands a value of each exact type: a child pusher for
+# containers, None for leaves. Filled in lazily by _child_pusher.
+_CHILD_PUSHERS = {dict: _push_map_children, list: _push_list_children}
+
+
+def _child_pusher(value_type: type) -> Any:
+    """Look up and remember how to expand values of a type not seen before."""
+    if issubclass(value_type, dict):
+        pusher = _push_map_children
+    elif issubclass(value_type, list):
+        pusher = _push_list_children
+    else:
+        pusher = None
+    _CHILD_PUSHERS[value_type] = pusher
+    return pusher
 
 
-def compute_diff(old: Any, new: Any, path: Optional[List[str]] = None) -> List[DiffOp]:
+def compute_diff(old: Any, new: Any, path: Optional[Sequence[str]] = None) -> List[DiffOp]:
     """
-    Recursively compute differences between two YAML structures.
+    Compute differences between two YAML structures.
     
-    Dispatches to appropriate diff function based on types.
-    Handles type mismatches by returning a replace operation.
+    Walks both structures with an explicit stack of frames instead of
+    recursion, so nesting depth is not bounded by the Python recursion limit.
+    Children are visited depth-first in sorted key / index order. Handles
+    type mismatches by emitting a replace operation.
+    
+    Each frame holds its parent's path and its own segment; the child path
+    tuple is only built once the values are known to differ, so the equal
+    siblings of a change never allocate one.
     
     Args:
         old: First YAML value
         new: Second YAML value
-        path: Current path (for recursive calls)
+        path: Path of the values being compared (defaults to the root)
         
     Returns:
         List of DiffOp objects representing the differences
     """
-    if path is None:
-        path = []
-    
-    # If values are equal, no diff
-    if old == new:
-        return []
+    diffs = []
+    stack = [(old, new, _EMPTY_PATH if not path else tuple(path), None)]
     
-    # Handle type mismatches - replace the entire value
-    old_type = type(old)
-    new_type = type(new)
+    # Local aliases for the hot loop
+    pop = stack.pop
+    emit = diffs.append
+    pushers = _CHILD_PUSHERS
     
-    if old_type != new_type:
-        return [DiffOp('replace', path, old, new)]
+    while stack:
+        old, new, path, segment = pop()
+        
+        # Same object: nothing can differ, skip the deep equality walk
+        if old is new:
+            continue
+        
+        # Equal values produce no diff; each frame is compared exactly once.
+        # == recurses in C, so a very deep subtree is expanded frame by
+        # frame instead and its children are compared one level lower.
+        # _MISSING never compares equal, so add/remove fall through.
+        try:
+            if old == new:
+                continue
+        except RecursionError:
+            pass
+        
+        if segment is not None:
+            path = path + (segment,)
+        old_type = type(old)
+        
+        # Key or index present on only one side
+        if old is _MISSING:
+            emit(DiffOp('add', path, None, new))
+        elif new is _MISSING:
+            emit(DiffOp('remove', path, old, None))
+        # Handle type mismatches - replace the entire value
+        elif old_type is not type(new):
+            emit(DiffOp('replace', path, old, new))
+        else:
+            # One dict lookup picks the expansion for the value's exact type
+            try:
+                push_children = pushers[old_type]
+            except KeyError:
+                push_children = _child_pusher(old_type)
+            if push_children is not None:
+                push_children(old, new, path, stack)
+            else:
+                # A leaf already known to differ; diff_primitives inlined
+                emit(DiffOp('replace', path, old, new))
     
-    # Dispatch to appropriate diff function based on type
-    if isinstance(old, dict):
-        return diff_maps(old, new, path)
-    elif isinstance(old, list):
-        return diff_lists(old, new, path)
-    else:
-        return diff_primitives(old, new, path)
+    return diffs
+
+
+# RFC 6901 escapes (~ as ~0, / as ~1), applied in a single translate pass
+_POINTER_ESCAPES = str.maketrans({'~': '~0', '/': '~1'})
 
 
-def path_to_json_pointer(path: List[str]) -> str:
+def path_to_json_pointer(path: Sequence[str]) -> str:
     """
     Convert path segments to JSON pointer format (RFC 6901).
     
     Args:
-        path: List of path segments
+        path: Sequence of path segments
         
     Returns:
-        JSON pointer string (e.g., '/foo/bar/0')
+        JSON pointer string (e.g., '/foo/bar/0'), or '' for the root
     """
     if not path:
         return ''
     
-    # RFC 6901: escape ~ as ~0, then / as ~1
-    def escape(segment: str) -> str:
-        return segment.replace('~', '~0').replace('/', '~1')
+    # Fast path: no segment contains '~' or '/', so nothing needs escaping
+    pointer = '/' + '/'.join(map(str, path))
+    if '~' not in pointer and pointer.count('/') == len(path):
+        return pointer
+    
+    return ''.join('/' + str(seg).translate(_POINTER_ESCAPES) for seg in path)
+
+
+# Scalar types orjson writes exactly as json.dumps does (floats are checked
+# separately, since the two format some of them differently)
+_ORJSON_PLAIN_TYPES = frozenset((str, int, bool, type(None)))
+
+
+def _orjson_float_ok(value: float) -> bool:
+    """
+    Check that orjson writes a float as json.dumps does.
+    
+    They agree except on NaN/Infinity (orjson writes null) and on numbers
+    repr() puts in exponent form, like 1e+16 or 1e-05.
+    """
+    return value == 0.0 or 1e-4 <= abs(value) < 1e16
+
+
+def _orjson_matches_json(value: Any) -> bool:
+    """Check that orjson would serialize value exactly as json.dumps does."""
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        item_type = type(item)
+        if item_type is dict:
+            for key in item:
+                if type(key) is float:
+                    if not _orjson_float_ok(key):
+                        return False
+                elif type(key) not in _ORJSON_PLAIN_TYPES:
+                    return False
+            stack.extend(item.values())
+        elif item_type is list:
+            stack.extend(item)
+        elif item_type is float:
+            if not _orjson_float_ok(item):
+                return False
+        elif item_type not in _ORJSON_PLAIN_TYPES:
+            # e.g. dates, which json rejects and orjson would write
+            return False
+    return True
+
+
+def _dumps_indented(value: Any) -> str:
+    """
+    Serialize a value as json.dumps(value, indent=2) does.
     
-    return '/' + '/'.join(escape(str(seg)) for seg in path)
+    orjson is used when it is installed and would write the same text.
+    Anything else, such as NaN, a date, or non-ASCII text, goes through json.
+    """
+    if orjson is not None and _orjson_matches_json(value):
+        try:
+            data = orjson.dumps(
+                value, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+            )
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits, which json still handles
+            pass
+        else:
+            # json escapes non-ASCII and DEL as \uXXXX; orjson writes them raw
+            if data.isascii() and b'\x7f' not in data:
+                return data.decode()
+    return json.dumps(value, indent=2)
 
 
 def format_json_patch(diffs: List[DiffOp]) -> str:
@@ -279,17 +632,18 @@ def format_json_patch(diffs: List[DiffOp]) -> str:
     """
     operations = []
     
+    # Values are canonicalized so map keys inside them print in sorted order
     for diff in diffs:
         path = path_to_json_pointer(diff.path)
         
         if diff.op == 'add':
-            operations.append({'op': 'add', 'path': path, 'value': diff.new_value})
+            operations.append({'op': 'add', 'path': path, 'value': canonicalize(diff.new_value)})
         elif diff.op == 'remove':
             operations.append({'op': 'remove', 'path': path})
         elif diff.op == 'replace':
-            operations.append({'op': 'replace', 'path': path, 'value': diff.new_value})
+            operations.append({'op': 'replace', 'path': path, 'value': canonicalize(diff.new_value)})
     
-    return json.dumps(operations, indent=2)
+    return _dumps_indented(operations)
 
 
 # ANSI color codes
@@ -358,16 +712,17 @@ def _format_value(value: Any) -> str:
     if isinstance(value, str):
         return value
     if isinstance(value, (dict, list)):
-        return json.dumps(value, indent=2).replace('\n', '\n  ')
+        return _dumps_indented(canonicalize(value)).replace('\n', '\n  ')
     return str(value)
 
 
-def should_use_color(no_color_flag: bool = False) -> bool:
+def should_use_color(no_color_flag: bool = False, stream: Optional[TextIO] = None) -> bool:
     """
     Determine if output should be colorized.
     
     Args:
         no_color_flag: Whether --no-color flag was passed
+        stream: Output stream to check (defaults to sys.stdout)
         
     Returns:
         True if colors should be used
@@ -376,8 +731,10 @@ def should_use_color(no_color_flag: bool = False) -> bool:
     if no_color_flag:
         return False
     
-    # Check if stdout is a TTY
-    return sys.stdout.isatty()
+    # Check if the output stream is a TTY
+    if stream is None:
+        stream = sys.stdout
+    return stream.isatty()
 
 
 def compute_exit_code(old_data: Any, new_data: Any) -> int:
@@ -391,9 +748,7 @@ def compute_exit_code(old_data: Any, new_data: Any) -> int:
     Returns:
         0 if identical, 1 if different
     """
-    old_canon = canonicalize(old_data)
-    new_canon = canonicalize(new_data)
-    diffs = compute_diff(old_canon, new_canon)
+    diffs = compute_diff(old_data, new_data)
     return 0 if not diffs else 1
 
 
@@ -432,33 +787,56 @@ def create_argument_parser() -> argparse.ArgumentParser:
         action='store_true',
         help='Disable colorized output'
     )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help=f'Ignore the parsed-YAML sidecar cache (${CACHE_DIR_ENV})'
+    )
     
     return parser
 
 
-def main() -> int:
+# Built once at import and reused by every main() call
+_PARSER = create_argument_parser()
+
+
+def main(argv: Optional[List[str]] = None,
+         stdout: Optional[TextIO] = None,
+         stderr: Optional[TextIO] = None) -> int:
     """
     Entry point for yaml-diff CLI.
     
     Parses arguments, loads YAML files, computes diff, and outputs results.
     
+    Args:
+        argv: Command-line arguments (defaults to sys.argv[1:])
+        stdout: Stream for diff output (defaults to sys.stdout)
+        stderr: Stream for error messages (defaults to sys.stderr)
+    
     Returns:
         Exit code: 0 if identical, 1 if different, 2 on error
     """
-    parser = create_argument_parser()
-    args = parser.parse_args()
+    if stdout is None:
+        stdout = sys.stdout
+    if stderr is None:
+        stderr = sys.stderr
+    
+    # argparse prints usage, errors and --help to sys.stdout/sys.stderr and
+    # exits; send that to the given streams and return the exit code instead
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            args = _PARSER.parse_args(argv)
+    except SystemExit as e:
+        return e.code
     
     try:
         # Load and validate both YAML inputs
-        old_data = load_yaml(args.file1)
-        new_data = load_yaml(args.file2)
-        
-        # Canonicalize for consistent comparison
-        old_canon = canonicalize(old_data)
-        new_canon = canonicalize(new_data)
+        old_data = load_yaml(args.file1, cache=not args.no_cache)
+        new_data = load_yaml(args.file2, cache=not args.no_cache)
         
-        # Compute diff
-        diffs = compute_diff(old_canon, new_canon)
+        # Compute diff; keys are visited in sorted order, so the parsed
+        # data needs no canonical copy first
+        diffs = compute_diff(old_data, new_data)
         
         # If no differences, exit with code 0
         if not diffs:
@@ -468,17 +846,17 @@ def main() -> int:
         if args.json_patch:
             output = format_json_patch(diffs)
         else:
-            use_color = should_use_color(args.no_color)
+            use_color = should_use_color(args.no_color, stdout)
             output = format_human(diffs, use_color)
         
-        print(output)
+        print(output, file=stdout)
         return 1
         
     except YamlDiffError as e:
-        print(f"yaml-diff: error: {e}", file=sys.stderr)
+        print(f"yaml-diff: error: {e}", file=stderr)
         return 2
     except Exception as e:
-        print(f"yaml-diff: error: {e}", file=sys.stderr)
+        print(f"yaml-diff: error: {e}", file=stderr)
         return 2
 
 